@@ -1,12 +1,10 @@
-# 检测 sslocal 命令是否存在
-import shutil
+from .core import SSLOCAL, Proxy, ProxyError, ProxyPool
+from .util import from_base64, group_by_location, test, tests
 
-if not shutil.which('sslocal'):
+# 检测 sslocal 命令是否存在
+if SSLOCAL is None:
     raise FileNotFoundError('未找到 sslocal ( https://github.com/shadowsocks/shadowsocks-rust )')
 
-from .core import Proxy, ProxyError, ProxyPool
-from .util import from_base64, group_by_location, test, tests
-
 
 __all__ = (
     'Proxy',
@@ -1,21 +1,110 @@
 from __future__ import annotations
 
-from asyncio import Queue, gather, sleep
+from asyncio import (
+    CancelledError,
+    Future,
+    Semaphore,
+    Task,
+    TaskGroup,
+    TimeoutError,
+    create_task,
+    get_running_loop,
+    open_connection,
+    wait,
+    wait_for,
+)
 from asyncio.subprocess import DEVNULL, Process, create_subprocess_exec
+from bisect import insort
+from collections import deque
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from os import name as os_name
 from pathlib import Path
-from random import randint
+from shutil import which
+from socket import SO_REUSEADDR, SOL_SOCKET, socket
 from time import monotonic
 from typing import Any, AsyncGenerator, Collection, Final, Self
 from weakref import finalize
 
-from .util import CustomPriorityQueue, tests
+from .util import test
+
+
+SSLOCAL: Final[str | None] = which('sslocal')
+"""sslocal 可执行文件的绝对路径（未找到时为 None）"""
+
+READY_PROBE_DELAYS: Final[tuple[float, ...]] = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5)
+"""节点启动就绪探测的退避间隔（秒）"""
 
 
 class ProxyError(Exception): ...
 
 
+@lru_cache
+def resolve_acl(acl: str | Path) -> str:
+    """
+    校验 ACL 文件并返回其绝对路径（结果会被缓存，同一路径仅检查一次）
+
+    :raises FileNotFoundError: ACL 文件不存在
+    """
+    path = Path(acl).resolve()
+    if not path.is_file():
+        raise FileNotFoundError(acl)
+    return str(path)
+
+
+def terminate_process(process: Process) -> None:
+    """终止仍在运行的节点进程"""
+    if process.returncode is None:
+        process.terminate()
+
+
+def report_task_exception(task: Task[Any]) -> None:
+    """将后台任务的异常交由事件循环的异常处理器记录（同时标记异常已被获取）"""
+    if not task.cancelled() and (exc := task.exception()) is not None:
+        task.get_loop().call_exception_handler(
+            {'message': f'后台任务 {task.get_name()} 出错', 'exception': exc, 'task': task}
+        )
+
+
+def is_port_free(port: int) -> bool:
+    """检查本地端口是否空闲"""
+    with socket() as s:
+        # 与 sslocal 一致地设置 SO_REUSEADDR，避免将仅剩 TIME_WAIT 连接的端口误判为占用
+        # （Windows 下该选项允许抢占正在监听的端口，故不设置）
+        if os_name != 'nt':
+            s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        try:
+            s.bind(('localhost', port))
+        except OSError:
+            return False
+        return True
+
+
+def free_port() -> int:
+    """由系统分配一个空闲的本地端口"""
+    with socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
 class Proxy:
+    __slots__ = (
+        '_server_addr',
+        '_encrypt_method',
+        '_password',
+        'name',
+        '_hash',
+        '_repr',
+        '_str',
+        '_server_args',
+        '_disable_until',
+        '_process',
+        '_port',
+        '_url',
+        '_finalizer',
+        '__weakref__',  # weakref.finalize 需要
+    )
+
     def __init__(
         self, server_addr: str, encrypt_method: str, password: str, name: str = 'UNKNOWN'
     ) -> None:
@@ -29,14 +118,29 @@ class Proxy:
         self._encrypt_method: Final[str] = encrypt_method
         self._password: Final[str] = password
         self.name: Final[str] = name
+        # 字段不可变，预先计算哈希与字符串表示
+        self._hash: Final[int] = hash((type(self).__name__, server_addr))
+        self._repr: Final[str] = (
+            f'{type(self).__name__}(name="{name}", server_addr="{server_addr}", '
+            f'encrypt_method="{encrypt_method}", password="{password}")'
+        )
+        self._str: Final[str] = f'name="{name}", server_addr="{server_addr}"'
+        # sslocal 中与本地端口无关的参数
+        self._server_args: Final[tuple[str, ...]] = (
+            '-s',
+            server_addr,
+            '-m',
+            encrypt_method,
+            '-k',
+            password,
+        )
 
         # 节点状态
         self._disable_until: float = monotonic()  # 禁用解除时间
         self._process: Process | None = None  #  节点进程
         self._port: int | None = None  #  本地绑定端口
-
-        # 注册终结器确保资源清理（防止内存泄漏）
-        self._finalizer = finalize(self, Proxy.stop, self)
+        self._url: str | None = None  # 本地代理 URL（启动时生成）
+        self._finalizer: finalize | None = None  # 进程终结器（仅在进程运行时注册）
 
     @property
     def url(self) -> str:
@@ -47,8 +151,8 @@ class Proxy:
 
         :raises ProxyError: 节点未启动
         """
-        if self.is_started():
-            return f'http://localhost:{self._port}'
+        if self._url is not None and self.is_started():
+            return self._url
         raise ProxyError('代理未启动')
 
     def is_started(self) -> bool:
@@ -60,70 +164,92 @@ class Proxy:
         启动节点
 
         - 指定端口：仅尝试一次，失败则报错
-        - 未指定端口：随机尝试端口直至成功
+        - 未指定端口：由系统分配空闲端口，失败时换一个端口重试一次
 
-        :raises ProxyError: 已指定端口且端口被占用
+        :raises ProxyError: 启动失败（如端口被占用）
         :raises FileNotFoundError: 已指定 ACL 文件但文件不存在
         """
-        while True:
+        if self.is_started():
+            return
+
+        acl = None if acl is None else resolve_acl(acl)
+
+        # 先行探测端口，避免为已被占用的端口启动进程
+        if port is None:
             try:
-                return await self._start(
-                    randint(10000, 60000) if port is None else port,
-                    acl=Path(acl) if isinstance(acl, str) else acl,
-                )
+                return await self._start(free_port(), acl=acl)
             except ProxyError:
-                if port is not None:
-                    raise
+                # 分配的端口可能在启动前被其他进程占用，换一个端口重试一次
+                return await self._start(free_port(), acl=acl)
+        elif not is_port_free(port):
+            raise ProxyError(f'端口 {port} 已被占用')
 
-    async def _start(self, port: int, acl: Path | None) -> None:
+        return await self._start(port, acl=acl)
+
+    async def _start(self, port: int, acl: str | None) -> None:
         """内部启动实现"""
-        if self.is_started():
-            return
+        if SSLOCAL is None:
+            raise ProxyError('未找到 sslocal')
 
-        # 构建命令行参数
-        cmd = (
-            'sslocal',
-            '-b',
-            f'localhost:{port}',
-            '-s',
-            self._server_addr,
-            '-m',
-            self._encrypt_method,
-            '-k',
-            self._password,
-        )
-        # 添加 ACL 支持
-        if acl is not None:
-            if not acl.is_file():
-                raise FileNotFoundError(acl)
-            cmd = cmd + ('--acl', str(acl))
+        # 构建命令行参数（添加 ACL 支持）
+        acl_args = () if acl is None else ('--acl', acl)
 
-        # 启动进程
+        # 启动进程（传入绝对路径，CPython 才会使用 posix_spawn 快速路径）
         process = await create_subprocess_exec(
-            *cmd,
+            SSLOCAL,
+            '-b',
+            f'localhost:{port}',
+            *self._server_args,
+            *acl_args,
             stderr=DEVNULL,
             stdout=DEVNULL,
         )
 
-        # 等待进程初始化
-        await sleep(1)
+        # 等待进程初始化：指数退避轮询，进程退出即失败，端口可连接即就绪
+        exited = create_task(process.wait())
+        try:
+            for delay in READY_PROBE_DELAYS:
+                # 等待退避间隔，期间进程退出则立即返回
+                await wait((exited,), timeout=delay)
+                if exited.done():
+                    break
+                try:
+                    _, writer = await wait_for(open_connection('localhost', port), timeout=delay)
+                    writer.close()
+                    await writer.wait_closed()
+                except (OSError, TimeoutError):
+                    continue
+                break
+        except BaseException:
+            # 启动被取消：终止尚未登记的进程，避免遗留
+            terminate_process(process)
+            raise
+        finally:
+            exited.cancel()
 
         # 验证启动状态
         returncode = process.returncode
         if returncode is None:
             self._process = process
             self._port = port
+            self._url = f'http://localhost:{port}'
+            # 注册终结器确保进程被清理（不引用 self，避免阻止回收）
+            self._finalizer = finalize(self, terminate_process, process)
             return
 
         raise ProxyError(f'启动失败（returncode={process.returncode}），可能是端口 {port} 已被占用')
 
     def stop(self) -> None:
         """停止进程并清理资源"""
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
         if self._process is not None:
             if self._process.returncode is None:
                 self._process.terminate()
             self._process = None
         self._port = None
+        self._url = None
 
     def disable(self, t: float = 60) -> None:
         """
@@ -133,23 +259,27 @@ class Proxy:
         """
         self._disable_until = monotonic() + t
 
-    def is_disabled(self) -> bool:
-        """检查节点当前是否被禁用"""
-        return self._disable_until > monotonic()
+    def is_disabled(self, now: float | None = None) -> bool:
+        """
+        检查节点当前是否被禁用
+
+        :param now: 当前时间（time.monotonic()，可选），便于批量操作共用同一时间戳
+        """
+        return self._disable_until > (monotonic() if now is None else now)
 
     def __repr__(self) -> str:
-        return f'{type(self).__name__}(name="{self.name}", server_addr="{self._server_addr}", encrypt_method="{self._encrypt_method}", password="{self._password}")'
+        return self._repr
 
     def __str__(self) -> str:
-        return f'name="{self.name}", server_addr="{self._server_addr}"'
+        return self._str
 
     def __hash__(self) -> int:
         """服务器地址相同即视为相等"""
-        return hash(f'{type(self).__name__}(server_addr="{self._server_addr}")')
+        return self._hash
 
     def __eq__(self, o: Any) -> bool:
         """服务器地址相同即视为相等"""
-        return isinstance(o, type(self)) and hash(self) == hash(o)
+        return self is o or (type(o) is type(self) and self._server_addr == o._server_addr)
 
 
 class ProxyPool:
@@ -160,31 +290,70 @@ class ProxyPool:
         proxies: Collection[Proxy],
         test_timeout: float = 10,
         acl: str | Path | None = None,
+        keepalive: float = 300,
+        max_spawn: int = 32,
     ) -> None:
         """
         :param proxies: 初始代理集合
         :param test_timeout: 代理测试超时时间（秒）（小于等于 0 表示跳过测试）
         :param acl: 代理路由规则配置文件路径（可选）
+        :param keepalive: 被禁用节点保持进程运行的最长剩余禁用时长（秒）（超过则停止进程）
+        :param max_spawn: 同时启动的节点进程数上限（启动代理池与获取节点时共用）
+
+        :raises FileNotFoundError: 已指定 ACL 文件但文件不存在
         """
-        self._acl = acl
+        # 提前校验 ACL 文件，避免每次启动节点时重复检查
+        self._acl = None if acl is None else resolve_acl(acl)
         self._test_timeout = test_timeout
+        self._keepalive = keepalive
 
-        # 所有节点（已去重）
-        self._all: list[Proxy] = list(set(proxies))
+        # 所有节点（已去重，保持原有顺序）
+        self._all: tuple[Proxy, ...] = tuple(dict.fromkeys(proxies))
 
-    async def acquire(self) -> Proxy:
-        """获取可用节点"""
-        proxy = await self._queue.get()
+        # 等待空闲节点的获取者（先进先出），节点释放或通过测试时逐个唤醒
+        self._waiters: deque[Future[None]] = deque()
 
-        # 若代理被禁用，等待至禁用解除
-        if proxy.is_disabled():
-            await sleep(proxy._disable_until - monotonic())
+        # 后台节点测试任务
+        self._checking: Task[None] | None = None
 
-        # 确保代理进程已启动
-        if not proxy.is_started():
-            await proxy.start(acl=self._acl)
+        # 限制同时启动的节点进程数，避免瞬间大量 fork
+        self._spawn_sem = Semaphore(max_spawn)
 
-        return proxy
+    async def acquire(self) -> Proxy:
+        """获取可用节点"""
+        while True:
+            # 将已解除禁用的节点移入就绪队列
+            now = monotonic()
+            while self._blocked and self._blocked[0]._disable_until <= now:
+                self._ready.append(self._blocked.pop(0))
+
+            if not self._ready:
+                # 无就绪节点：等待至最早的禁用解除或被唤醒
+                await self._wait(self._blocked[0]._disable_until - now if self._blocked else None)
+                continue
+
+            proxy = self._ready.popleft()
+            # 节点在空闲期间被禁用：移入禁用列表，重新选择节点
+            if proxy.is_disabled(now):
+                self._put(proxy, now)
+                continue
+
+            # 确保代理进程已启动
+            if not proxy.is_started():
+                try:
+                    async with self._spawn_sem:
+                        await proxy.start(acl=self._acl)
+                except ProxyError:
+                    # 启动失败：禁用并归还节点，换下一个节点
+                    proxy.disable()
+                    self.release(proxy)
+                    continue
+                except BaseException:
+                    # 被取消或出现意外错误：归还节点，避免节点丢失
+                    self.release(proxy)
+                    raise
+
+            return proxy
 
     def release(self, proxy: Proxy) -> None:
         """
@@ -192,10 +361,19 @@ class ProxyPool:
 
         :param proxy: 要释放的节点
         """
-        # 节点已禁用：停止进程
-        if proxy.is_disabled():
+        now = monotonic()
+        # 节点禁用时间较长：停止进程；禁用时间较短则保持进程运行，解除禁用后无需重启
+        if proxy._disable_until - now > self._keepalive:
             proxy.stop()
-        self._queue.put_nowait(proxy)
+        self._put(proxy, now)
+        self._wakeup()
+
+    def _put(self, proxy: Proxy, now: float | None = None) -> None:
+        """将空闲节点放入就绪队列或禁用列表"""
+        if proxy.is_disabled(now):
+            insort(self._blocked, proxy, key=lambda p: p._disable_until)
+        else:
+            self._ready.append(proxy)
 
     @asynccontextmanager
     async def use(self) -> AsyncGenerator[Proxy]:
@@ -215,39 +393,121 @@ class ProxyPool:
         """
         proxy.disable(t)
 
+    async def _wait(self, timeout: float | None) -> None:
+        """
+        排队等待被唤醒
+
+        :param timeout: 最长等待时间（秒）（None 表示一直等待）
+        """
+        waiter: Future[None] = get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await wait_for(waiter, timeout)
+        except TimeoutError:
+            pass
+        except CancelledError:
+            # 已被唤醒却被取消：将唤醒转交给下一个获取者
+            if not waiter.cancelled():
+                self._wakeup()
+            raise
+        finally:
+            # 超时或取消的等待者可能仍在队列中
+            if waiter.cancelled() and waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _wakeup(self) -> None:
+        """唤醒最早等待的一个获取者"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
     async def start(self, timeout: float) -> None:
         """
-        初始化代理池并验证节点可用性
+        初始化代理池并在后台验证节点可用性
 
-        :raises ProxyError: 无可用代理
+        - timeout <= 0：跳过测试，所有节点直接可用
+        - 否则：出现首个通过测试的节点即返回，其余节点继续在后台测试，通过后陆续加入代理池
+
+        :raises ProxyError: 无可用代理（所有节点均未通过测试）
         """
-        # 按禁用解除时间排序
-        self._queue: Queue[Proxy] = CustomPriorityQueue(lambda p: p._disable_until)
+        # 空闲节点：就绪队列（先进先出）与禁用列表（按禁用解除时间排序）
+        self._ready: deque[Proxy] = deque()
+        self._blocked: list[Proxy] = list()
 
         # timeout <= 0 时跳过测试直接初始化
         if timeout <= 0:
+            now = monotonic()
             for p in self._all:
-                self._queue.put_nowait(p)
+                self._put(p, now)
 
         else:
-            # 并行启动所有节点
-            await gather(*[p.start(acl=self._acl) for p in self._all])
-            # 批量测试节点有效性
-            proxy_status = await tests(*self._all, timeout=timeout)
-            for p, s in proxy_status.items():
-                # 有效节点放入队列
-                if s:
-                    self._queue.put_nowait(p)
-                # 失败节点直接关闭
+            # 后台启动并测试节点，有效节点随测随入；出现首个可用节点（或全部测试完成）即返回
+            self._checking = checking = create_task(self._check_all(timeout))
+            checking.add_done_callback(lambda _: self._wakeup())
+            try:
+                while self.count() == 0 and not checking.done():
+                    await self._wait(None)
+                if checking.done():
+                    checking.result()
                 else:
-                    p.stop()
+                    # 此后无人等待后台测试，其异常交由事件循环记录
+                    checking.add_done_callback(report_task_exception)
+            except BaseException:
+                # 启动被取消或测试出错：__aexit__ 不会被调用，需在此停止后台测试及已启动的进程
+                self.stop()
+                raise
 
         # 确保至少有一个可用节点
-        if self._queue.qsize() == 0:
+        if self.count() == 0:
             raise ProxyError('无可用节点')
 
+    async def wait_tested(self) -> None:
+        """等待后台节点测试全部完成（取消等待不会中断测试）"""
+        if self._checking is not None:
+            await wait((self._checking,))
+
+    async def _check_all(self, timeout: float) -> None:
+        """并行启动并测试所有节点（单个节点出错只跳过该节点）"""
+        from aiohttp import ClientSession, TCPConnector
+
+        # 限制并发测试数
+        semaphore = Semaphore(10)
+
+        async def _check(proxy: Proxy, session: ClientSession) -> None:
+            """启动节点后立即测试，无需等待其余节点启动完成"""
+            try:
+                async with self._spawn_sem:
+                    await proxy.start(acl=self._acl)
+                async with semaphore:
+                    ok = await test(proxy, session=session, timeout=timeout)
+            # 启动失败（端口被占用、描述符耗尽等）的节点直接跳过，不影响其余节点及已取出的节点
+            except Exception:
+                ok = False
+            except BaseException:
+                proxy.stop()
+                raise
+            # 有效节点放入队列
+            if ok:
+                self._put(proxy)
+                self._wakeup()
+            # 失败节点直接关闭
+            else:
+                proxy.stop()
+
+        # 所有测试共用一个会话；每个测试经由不同节点，连接无法复用，
+        # 因此不保留空闲连接，并发上限交由 semaphore 控制
+        connector = TCPConnector(limit=0, force_close=True)
+        async with ClientSession(connector=connector) as session, TaskGroup() as tg:
+            for p in self._all:
+                tg.create_task(_check(p, session))
+
     def stop(self) -> None:
-        """关闭代理池：停止所有节点的进程"""
+        """关闭代理池：停止后台测试及所有节点的进程"""
+        if self._checking is not None:
+            self._checking.cancel()
+            self._checking = None
         for p in self._all:
             p.stop()
 
@@ -256,12 +516,18 @@ class ProxyPool:
         return self
 
     async def __aexit__(self, et, ev, eb) -> bool | None:
+        checking = self._checking
         self.stop()
+        # 等待被取消的后台测试结束，确保启动中的节点进程也已终止
+        # （wait 不会抛出测试任务自身的取消或异常，但仍响应外部取消）
+        if checking is not None:
+            await wait((checking,))
 
     def count(self) -> int:
         """
         获取节点总数（未被使用的可用节点数）
 
-        # NOTICE: 仅包含队列中的节点数，不代表总节点数
+        # NOTICE: 仅包含空闲的节点数（含被禁用的节点），不代表总节点数；
+        #         后台测试尚未完成时，仍在测试中的节点也不计入（可先 await wait_tested()）
         """
-        return self._queue.qsize()
+        return len(self._ready) + len(self._blocked)
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
 import re
-from abc import abstractmethod
-from asyncio import Queue, Semaphore, create_task, gather
-from base64 import b64decode
+from asyncio import Semaphore, TaskGroup
+from binascii import a2b_base64
 from collections import defaultdict
-from heapq import heappop, heappush
-from typing import TYPE_CHECKING, Callable, Collection, Generic, Protocol, TypeVar, runtime_checkable
+from functools import lru_cache
+from typing import TYPE_CHECKING, Collection
 from urllib.parse import unquote_plus
 
+# 优先使用 orjson 解析响应
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 if TYPE_CHECKING:
-    from aiohttp import ClientSession
+    from aiohttp import ClientSession, ClientTimeout
     from .core import Proxy
 
 
+LOCATION: re.Pattern[str] = re.compile(r'(.*?)[0-9]+线 \| [A-Z]')
+"""从节点名中提取地区的正则表达式"""
+
+
 def group_by_location(
     proxies: Collection[Proxy], default: str = 'UNKNOWN'
 ) -> defaultdict[str, list[Proxy]]:
@@ -28,7 +37,7 @@ def group_by_location(
     result: defaultdict[str, list[Proxy]] = defaultdict(list)
 
     for p in proxies:
-        if m := re.search(r'(.*?)\d+线 \| [A-Z]', p.name):
+        if m := LOCATION.match(p.name):
             id = str(m.group(1))
             result[id].append(p)
         else:
@@ -37,45 +46,65 @@ def group_by_location(
     return result
 
 
-SS_URL: re.Pattern[str] = re.compile(r'^ss://([A-Za-z0-9]+)@([a-z0-9\.]+?\.com:\d{1,5})#(.*?)$')
-"""解析 ss 链接的正则表达式"""
+SS_URL: re.Pattern[bytes] = re.compile(
+    rb'^ss://([A-Za-z0-9]+)@([a-z0-9\.]+?\.com:\d{1,5})#([^\r\n]*?)\r?$', re.MULTILINE
+)
+"""解析 ss 链接的正则表达式（直接在解码后的整段字节串上逐行匹配）"""
 
 
-def from_base64(encoding: str, ignore: Collection[str | re.Pattern[str]] | None = None) -> list[Proxy]:
-    """从 base64 编码中解析节点"""
+def from_base64(
+    encoding: str | bytes, ignore: Collection[str | re.Pattern[str]] | None = None
+) -> list[Proxy]:
+    """从 base64 编码中解析节点（可直接传入以二进制模式读取的文件内容）"""
     from .core import Proxy
 
+    # 字符串规则合并为单个正则一次匹配，正则规则逐个匹配
+    ignore = () if ignore is None else ignore
+    words = '|'.join(re.escape(pt) for pt in ignore if isinstance(pt, str))
+    ignore_words = re.compile(words) if words else None
+    ignore_patterns = [pt for pt in ignore if not isinstance(pt, str)]
+
     result: set[Proxy] = set()  # 去除重复项
-    for line in b64decode(encoding).decode().splitlines():
-        if m := SS_URL.search(line):
-            encrypt_method, password = b64decode(m.group(1)).decode().split(':', 1)
-            server_addr = m.group(2)
-            name = unquote_plus(m.group(3))
-
-            if ignore is not None:
-                # 跳过忽略的节点
-                if any(
-                    pt in name if isinstance(pt, str) else pt.search(name) is not None for pt in ignore
-                ):
-                    continue
-
-            result.add(
-                Proxy(
-                    server_addr=server_addr,
-                    encrypt_method=encrypt_method,
-                    password=password,
-                    name=name,
-                )
+    # 保持字节串直至匹配成功，仅解码捕获的字段
+    # （a2b_base64 跳过 Python 层校验；多余的填充会被忽略，因此补上 '==' 以兼容省略填充的编码）
+    if isinstance(encoding, str):
+        encoding = encoding.encode('ascii')
+    for m in SS_URL.finditer(a2b_base64(encoding + b'==')):
+        encrypt_method, password = a2b_base64(m.group(1) + b'==').decode().split(':', 1)
+        server_addr = m.group(2).decode('ascii')
+        name = unquote_plus(m.group(3).decode())
+
+        # 跳过忽略的节点
+        if ignore_words is not None and ignore_words.search(name) is not None:
+            continue
+        if any(pt.search(name) is not None for pt in ignore_patterns):
+            continue
+
+        result.add(
+            Proxy(
+                server_addr=server_addr,
+                encrypt_method=encrypt_method,
+                password=password,
+                name=name,
             )
+        )
     return list(result)
 
 
+@lru_cache(maxsize=16)
+def client_timeout(timeout: float) -> ClientTimeout:
+    """获取请求超时配置（按超时时间缓存，避免每次请求重复创建）"""
+    from aiohttp import ClientTimeout
+
+    return ClientTimeout(timeout)
+
+
 async def test(proxy: Proxy, session: ClientSession | None = None, timeout: float = 10) -> bool:
     """测试节点有效性"""
     if timeout <= 0:
         raise ValueError(f'timeout={timeout} 必须为正整数')
 
-    from aiohttp import ClientSession, ClientTimeout
+    from aiohttp import ClientSession
 
     flag = False
     # session 为 None，就创建新 session，并在结束时关闭该新 session
@@ -87,11 +116,11 @@ async def test(proxy: Proxy, session: ClientSession | None = None, timeout: floa
         async with session.get(
             url='http://ip-api.com/json',
             proxy=proxy.url,
-            timeout=ClientTimeout(timeout),
+            timeout=client_timeout(timeout),
             raise_for_status=True,
         ) as resp:
             # 若返回的 countryCode == CN 或在请求时出错了就返回 False
-            resp_json = await resp.json()
+            resp_json = await resp.json(loads=json_loads)
             if resp_json['countryCode'] == 'CN':
                 return False
             return True
@@ -107,22 +136,37 @@ async def tests(
     session: ClientSession | None = None,
     timeout: float = 10,
     semaphore: Semaphore | None = None,
+    concurrency: int | None = None,
 ) -> dict[Proxy, bool]:
-    """并发测试多个节点的有效性"""
+    """
+    并发测试多个节点的有效性
+
+    :param semaphore: 与其他任务共享的并发限制（可选）
+    :param concurrency: 并发测试数（工作协程数）
+        （默认：指定 semaphore 时不限制，并发数由 semaphore 控制；否则为 10）
+    """
     if timeout <= 0:
         raise ValueError(f'timeout={timeout} 必须为正整数')
+    if concurrency is None:
+        concurrency = len(proxies) if semaphore is not None else 10
+    elif concurrency < 1:
+        raise ValueError(f'concurrency={concurrency} 必须为正整数')
 
     from aiohttp import ClientSession
 
-    result: dict[Proxy, bool] = dict()
-    # 限制 _run 的并发数
-    semaphore = semaphore if semaphore is not None else Semaphore(10)
+    # 预先按输入顺序填充结果，工作协程只更新已有的键
+    result: dict[Proxy, bool] = dict.fromkeys(proxies, False)
 
-    async def _run(
-        semaphore: Semaphore, proxy: Proxy, session: ClientSession, timeout: float
-    ) -> tuple[Proxy, bool]:
-        async with semaphore:
-            return proxy, await test(proxy=proxy, session=session, timeout=timeout)
+    # 待测节点：由固定数量的工作协程共用同一迭代器逐个取出测试，避免一次性为每个节点创建任务
+    pending = iter(proxies)
+
+    async def _run(session: ClientSession) -> None:
+        for proxy in pending:
+            if semaphore is None:
+                result[proxy] = await test(proxy=proxy, session=session, timeout=timeout)
+            else:
+                async with semaphore:
+                    result[proxy] = await test(proxy=proxy, session=session, timeout=timeout)
 
     flag = False
     # session 为 None，就创建新 session，并在结束时关闭该新 session
@@ -131,51 +175,11 @@ async def tests(
         session = ClientSession()
 
     try:
-        tasks = [create_task(_run(semaphore, p, session, timeout)) for p in proxies]
-        for p, r in await gather(*tasks):
-            result[p] = r
+        async with TaskGroup() as tg:
+            for _ in range(min(concurrency, len(proxies))):
+                tg.create_task(_run(session))
     finally:
         if flag:
             await session.close()
 
     return result
-
-
-T = TypeVar('T')
-P = TypeVar('P', contravariant=True)
-
-
-@runtime_checkable
-class SupportGtLt(Protocol, Generic[P]):
-    __slots__ = tuple()
-
-    @abstractmethod
-    def __gt__(self, o: P, /) -> bool: ...
-    def __lt__(self, o: P, /) -> bool: ...
-
-
-DEFAULT_PRIORITY = lambda x: x
-"""默认优先级计算方法"""
-
-
-class CustomPriorityQueue(Generic[T, P], Queue[T]):
-    """支持自定义优先级的优先队列"""
-
-    def __init__(
-        self, priority: Callable[[T], SupportGtLt[P]] = DEFAULT_PRIORITY, maxsize: int = 0
-    ) -> None:
-        self._prio = priority
-        self._auto_id: int = 0
-        super().__init__(maxsize)
-
-    def _init(self, maxsize: int) -> None:
-        self._queue: list[tuple[SupportGtLt[P], int, T]] = list()
-
-    def _get(self) -> T:
-        _, _, item = heappop(self._queue)
-        return item
-
-    def _put(self, item: T) -> None:
-        self._auto_id += 1
-        entity = (self._prio(item), self._auto_id, item)
-        heappush(self._queue, entity)
@@ -1,28 +1,40 @@
-from asyncio import gather, run
-from collections import defaultdict
+import sys
+from asyncio import TaskGroup, new_event_loop, run
+from collections import Counter
+from operator import itemgetter
 
-from aiohttp import ClientSession, DummyCookieJar
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
 from loguru import logger
 
-from ss_pool import ProxyPool, from_base64
+from ss_pool import Proxy, ProxyPool, from_base64
+
+DEAD_URL = 'http://localhost:1'
+"""不可用的代理地址，非香港节点都走这里以模拟失败"""
+
+MAX_RETRIES = 50
+"""单个请求的最大重试次数，避免节点全部失效时无限重试"""
 
 
 async def main() -> None:
-    with open('temp/proxy.base64', 'r') as fp:
+    # 以二进制模式读取，直接解码 base64，无需先转为字符串
+    with open('temp/proxy.base64', 'rb') as fp:
         proxies = from_base64(fp.read(), ignore=('剩余', '套餐'))
 
-    PROXY_HISTORY: dict[str, int] = defaultdict(int)
+    PROXY_HISTORY: Counter[Proxy] = Counter()
     """记录节点的使用次数"""
 
+    HK_PROXIES: frozenset[Proxy] = frozenset(p for p in proxies if p.name.startswith('香港'))
+    """香港节点（预先筛选，避免每次请求都匹配节点名）"""
+
     async def fetch(session: ClientSession, pool: ProxyPool) -> None:
         """从代理池中获取代理看看能否访问"""
         # 成功就返回，失败就拿出下一节点重试
-        while True:
+        for _ in range(MAX_RETRIES):
             async with pool.use() as proxy:
-                PROXY_HISTORY[proxy.name] += 1
+                PROXY_HISTORY[proxy] += 1
                 try:
                     # 非香港的节点都应失败
-                    proxy_url = proxy.url if proxy.name.startswith('香港') else 'http://localhost:1'
+                    proxy_url = proxy.url if proxy in HK_PROXIES else DEAD_URL
                     async with session.get('https://cp.cloudflare.com', proxy=proxy_url) as resp:
                         resp.raise_for_status()
                         logger.success(proxy)
@@ -32,18 +44,35 @@ async def main() -> None:
                     logger.error(f'{proxy} {type(e).__name__}({e})')
                     proxy.disable()
 
+        logger.warning(f'重试 {MAX_RETRIES} 次仍未成功，放弃')
+
     logger.info('加载代理池')
     async with ProxyPool(proxies) as pool:
-        async with ClientSession(cookie_jar=DummyCookieJar()) as session:
-            await gather(*[fetch(session, pool) for _ in range(300)])
+        connector = TCPConnector(limit=200, limit_per_host=50, ttl_dns_cache=300, keepalive_timeout=30)
+        async with ClientSession(connector=connector, cookie_jar=DummyCookieJar()) as session:
+            async with TaskGroup() as tg:
+                for _ in range(300):
+                    tg.create_task(fetch(session, pool))
 
     print('\n========== 节点使用记录 ==========')
-    for p, c in sorted(PROXY_HISTORY.items(), key=lambda kv: kv[1], reverse=True):
-        print(f'{p}\t{c}')
+    for p, c in sorted(PROXY_HISTORY.items(), key=itemgetter(1), reverse=True):
+        print(f'{p.name}\t{c}')
 
     async with ProxyPool(proxies) as pool:
+        # 等待后台测试完成后再统计可用节点数
+        await pool.wait_tested()
         print(pool.count())
 
 
 if __name__ == '__main__':
-    run(main())
+    # 优先使用 uvloop（不支持 Windows）
+    try:
+        from uvloop import new_event_loop
+    except ImportError:
+        pass
+
+    # 日志交由后台线程写出，避免大量失败时同步写 stderr 阻塞事件循环
+    logger.remove()
+    logger.add(sys.stderr, enqueue=True, backtrace=False, diagnose=False)
+
+    run(main(), loop_factory=new_event_loop)